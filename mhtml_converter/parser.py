@@ -1,40 +1,53 @@
-import base64
 import re
 import os
 import hashlib
-from typing import List, Dict, Tuple, Optional
-from .utils import PerformanceMonitor
+import quopri
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message
+from email.parser import HeaderParser
+from typing import List, Dict, Optional, Tuple, Union
+from .utils import FileUtils, PerformanceMonitor
+
+try:
+    import pybase64 as _b64
+except ImportError:
+    import base64 as _b64
 
 class MHTMLParser:
     """MHTML文件解析器，支持解析MHTML格式并提取HTML和图片内容"""
 
-    BOUNDARY = "boundary"
-    CHARSET = "charset"
-    CONTENT_TYPE = "Content-Type"
     CONTENT_TRANSFER_ENCODING = "Content-Transfer-Encoding"
     CONTENT_LOCATION = "Content-Location"
-    FILENAME = "filename="
+    CONTENT_ID = "Content-ID"
+    HASH_PREFIX_SIZE = 8192
+    HEADER_END_RE = re.compile(rb'(?:\A|\r?\n)\r?\n')
 
-    def __init__(self, mhtml_content: str = None, decode_images: bool = True):
+    def __init__(self, mhtml_content: Union[str, bytes, None] = None, decode_images: bool = True,
+                 image_workers: Optional[int] = None):
         self.mhtml_content = mhtml_content
         self.decode_images = decode_images
-        self.dataset: List[Tuple[str, str, str]] = []
-        self.boundary: Optional[str] = None
+        self.image_workers = image_workers
+        self.dataset: List[Tuple[str, str, Union[str, bytes]]] = []
         self.performance = PerformanceMonitor()
         self._missing_images: Dict[str, str] = {}
         self._image_paths: Dict[str, str] = {}
         self._image_content_types: Dict[str, str] = {}
+        self._image_encodings: Dict[str, str] = {}
+        self._charset_override: Optional[str] = None
+        self._default_charset: Optional[str] = None
+        self._lock = threading.Lock()
 
-    def _generate_image_filename(self, original_name: str, content: str, content_type: str) -> str:
+    def _generate_image_filename(self, original_name: str, content: bytes, content_type: str) -> str:
         """生成唯一的图片文件名"""
-        # 使用内容的哈希作为文件名的一部分，确保唯一性
-        content_hash = hashlib.md5(content.encode()).hexdigest()[:8]
+        # 使用内容开头部分的哈希作为文件名的一部分，在单个文件内足以保证唯一性
+        content_hash = hashlib.blake2b(content[:self.HASH_PREFIX_SIZE], digest_size=4).hexdigest()
         
         # 获取扩展名
         ext = self._get_image_extension(content_type)
         
         # 清理原始文件名，只保留基本部分
-        safe_name = re.sub(r'[<>:"/\\|?*]', '_', original_name)
+        safe_name = FileUtils.get_safe_filename(original_name)
         safe_name = safe_name.split('/')[-1].split('\\')[-1]  # 只保留文件名部分
         
         # 如果原始名称中有扩展名，去掉它
@@ -43,124 +56,83 @@ class MHTMLParser:
         # 组合新的文件名
         return f"{safe_name}_{content_hash}{ext}"
 
-    def _process_part(self, lines: List[str]) -> Tuple[str, str, str]:
-        """处理MHTML的单个部分"""
-        content_type = ""
-        content_location = ""
-        content_encoding = ""
-        filename = ""
-        content_id = ""
-        charset = "utf-8"
-        content_lines = []
-        
-        header_done = False
-        for line in lines:
-            line = line.strip()
+    def _write_one_image(self, output_dir: str,
+                         entry: Tuple[str, str, bytes]) -> Optional[Tuple[str, str]]:
+        """解码并保存单张图片，成功时返回 (资源名, 文件名)"""
+        content_type, name, content = entry
+        try:
+            # 图片在解析时保留原始编码，此时才解码
+            img_data = self._decode_body(content, self._image_encodings.get(name, ''))
+
+            # 生成图片文件名
+            filename = self._generate_image_filename(name, img_data, content_type)
+            image_path = os.path.join(output_dir, filename)
             
-            if not header_done:
-                if line == "":
-                    header_done = True
-                    continue
+            try:
+                with open(image_path, 'wb') as f:
+                    f.write(img_data)
+                return name, filename  # 只返回文件名，不包含路径
+            except Exception as e:
+                error = f"Failed to save image: {str(e)}"
                 
-                line_lower = line.lower()
-                if self.CONTENT_TYPE.lower() in line_lower:
-                    content_type = self._get_header_value(line)
-                elif self.CONTENT_LOCATION.lower() in line_lower:
-                    content_location = self._get_header_value(line)
-                elif self.CONTENT_TRANSFER_ENCODING.lower() in line_lower:
-                    content_encoding = self._get_header_value(line)
-                elif self.FILENAME.lower() in line_lower:
-                    try:
-                        if '"' in line:
-                            filename = line.split('="')[1].rstrip('"')
-                        elif "'" in line:
-                            filename = line.split("='")[1].rstrip("'")
-                        else:
-                            filename = line.split('=')[1].strip()
-                    except IndexError:
-                        continue
-                elif "content-id" in line_lower:
-                    try:
-                        content_id = line.split(':')[1].strip().strip('<>') 
-                    except IndexError:
-                        continue
-                elif self.CHARSET.lower() in line_lower:
-                    charset = self._get_header_value(line)
-            else:
-                content_lines.append(line)
-
-        content = '\n'.join(content_lines)
-        
-        # 根据编码处理内容
-        if content_encoding.lower() == 'base64':
-            if not content_type.startswith('image/'):
-                content = self._decode_base64(content)
-        elif content_encoding.lower() == 'quoted-printable':
-            content = self._decode_quoted_printable(content)
-
-        # 确定最终的资源标识符
-        resource_id = content_id or filename or content_location
-        if content_type.startswith('image/'):
-            self._image_content_types[resource_id] = content_type
+        except Exception as e:
+            error = str(e)
 
-        return content_type, resource_id, content
+        with self._lock:
+            self._missing_images[name] = error
+        return None
 
     def extract_images(self, output_dir: str) -> Dict[str, str]:
         """提取图片到指定目录"""
         os.makedirs(output_dir, exist_ok=True)
         self._image_paths.clear()
 
-        for content_type, name, content in self.dataset:
-            if not content_type.startswith("image/") or not name:
-                continue
+        images = [
+            entry for entry in self.dataset
+            if entry[0].startswith("image/") and entry[1]
+        ]
 
-            try:
-                # 生成图片文件名
-                filename = self._generate_image_filename(name, content, content_type)
-                image_path = os.path.join(output_dir, filename)
-                
-                try:
-                    # 清理并解码base64数据
-                    content = ''.join(content.split())
-                    img_data = base64.b64decode(content)
-                    with open(image_path, 'wb') as f:
-                        f.write(img_data)
-                    self._image_paths[name] = filename  # 只存储文件名，不包含路径
-                except Exception as e:
-                    self._missing_images[name] = f"Failed to decode/save image: {str(e)}"
-                    
-            except Exception as e:
-                self._missing_images[name] = str(e)
+        # 解码在C层释放GIL，写文件为I/O操作，适合用线程池并发处理
+        max_workers = self.image_workers or min(32, (os.cpu_count() or 1) * 4)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for result in executor.map(lambda entry: self._write_one_image(output_dir, entry), images):
+                if result:
+                    name, filename = result
+                    self._image_paths[name] = filename
 
         return self._image_paths
 
+    def _get_image_base64(self, name: str, content: bytes) -> str:
+        """获取图片的base64文本，原始数据本身为base64时直接复用"""
+        encoding = self._image_encodings.get(name, '')
+        if encoding == 'base64':
+            return b''.join(content.split()).decode('ascii')
+        return _b64.b64encode(self._decode_body(content, encoding)).decode('ascii')
+
+    def _replace_image_sources(self, html_content: str, sources: Dict[str, str]) -> str:
+        """将HTML中引用的图片一次性替换为新的src"""
+        if not sources:
+            return html_content
+
+        # 所有图片名合并为一个正则，只编译一次并扫描一遍HTML
+        lookup = {name.lower(): src for name, src in sources.items()}
+        names = sorted(sources, key=len, reverse=True)
+        pattern = re.compile(
+            r'src=(["\'])(?:cid:)?(' + '|'.join(re.escape(name) for name in names) + r')(?:\.dat)?\1',
+            re.IGNORECASE
+        )
+        return pattern.sub(lambda m: f'src="{lookup[m.group(2).lower()]}"', html_content)
+
     def _fix_html_paths(self, html_content: str) -> str:
         """修复HTML中的图片路径"""
-        for name, filename in self._image_paths.items():
-            # 处理各种可能的引用格式
-            patterns = [
-                f'src="cid:{re.escape(name)}"',
-                f'src="{re.escape(name)}"',
-                f'src=\'{re.escape(name)}\'',
-                f'src="cid:{re.escape(name)}.dat"',
-                f'src="{re.escape(name)}.dat"',
-                f'src=\'{re.escape(name)}.dat\'',
-            ]
-            
-            for pattern in patterns:
-                html_content = re.sub(
-                    pattern,
-                    f'src="images/{filename}"',
-                    html_content,
-                    flags=re.IGNORECASE
-                )
-
-        return html_content
+        return self._replace_image_sources(
+            html_content,
+            {name: f"images/{filename}" for name, filename in self._image_paths.items()}
+        )
 
     def get_html(self, embedded_images: bool = True) -> str:
         """获取HTML内容"""
         html_content = ""
-        image_map = {}
 
         # 首先找到HTML内容
         for content_type, name, content in self.dataset:
@@ -173,47 +145,109 @@ class MHTMLParser:
 
         # 处理图片
         if embedded_images:
-            for content_type, name, content in self.dataset:
-                if content_type.startswith("image/"):
-                    image_map[name] = (content_type, content)
-
-            # 替换图片引用
-            for name, (content_type, content) in image_map.items():
-                if self.decode_images:
-                    data_uri = f"data:{content_type};base64,{content}"
-                    html_content = re.sub(
-                        f'src="cid:{re.escape(name)}"',
-                        f'src="{data_uri}"',
-                        html_content,
-                        flags=re.IGNORECASE
-                    )
-                    html_content = re.sub(
-                        f'src="{re.escape(name)}"',
-                        f'src="{data_uri}"',
-                        html_content,
-                        flags=re.IGNORECASE
-                    )
+            if self.decode_images:
+                data_uris = {}
+                for content_type, name, content in self.dataset:
+                    if not content_type.startswith("image/") or not name:
+                        continue
+                    try:
+                        data_uris[name] = f"data:{content_type};base64,{self._get_image_base64(name, content)}"
+                    except Exception as e:
+                        # 单张图片无法嵌入时保留原引用，不影响整个文件
+                        self._missing_images[name] = f"Failed to embed image: {str(e)}"
+                html_content = self._replace_image_sources(html_content, data_uris)
         else:
             # 修复图片路径
             html_content = self._fix_html_paths(html_content)
 
         return html_content
 
-    def _find_boundary(self, lines: List[str]) -> Optional[str]:
-        """查找MHTML文件中的boundary标识"""
-        for line in lines:
-            line = line.strip()
-            if self.BOUNDARY in line.lower():
+    def _parse_headers(self, buffer, end: int, charset: str = 'utf-8') -> Tuple[Message, int]:
+        """解析缓冲区开头的头部，返回头部对象和正文起始位置"""
+        match = self.HEADER_END_RE.search(buffer, 0, end)
+        header_end, body_start = (match.start(), match.end()) if match else (end, end)
+        # 先把头部解码为文本再解析，非ASCII的Content-ID等值才能被正确读取
+        header_text = FileUtils.decode_bytes(bytes(buffer[:header_end]), charset)
+        return HeaderParser().parsestr(header_text), body_start
+
+    def _decode_body(self, body: bytes, encoding: str) -> bytes:
+        """根据Content-Transfer-Encoding解码正文"""
+        encoding = encoding.strip().lower()
+        if encoding == 'base64':
+            return _b64.b64decode(body)
+        if encoding == 'quoted-printable':
+            return quopri.decodestring(body)
+        return body
+
+    def _process_part(self, raw: bytes) -> None:
+        """处理MHTML的单个部分"""
+        header_charset = self._charset_override or self._default_charset or 'utf-8'
+        headers, body_start = self._parse_headers(raw, len(raw), header_charset)
+        content_type = headers.get_content_type()
+
+        # 嵌套的multipart部分按其自身的boundary继续拆分
+        boundary = headers.get_boundary()
+        if content_type.startswith('multipart/') and boundary:
+            self._split_parts(raw, boundary.encode('utf-8'), body_start)
+            return
+
+        content_id = headers.get(self.CONTENT_ID, '').strip().strip('<>')
+        resource_id = content_id or headers.get_filename() or headers.get(self.CONTENT_LOCATION, '')
+        resource_id = str(resource_id).strip()
+        encoding = headers.get(self.CONTENT_TRANSFER_ENCODING, '').strip().lower()
+
+        if content_type.startswith('image/'):
+            # 图片保留未解码的原始数据，等到提取或嵌入时再解码
+            content = raw[body_start:]
+            self._image_content_types[resource_id] = content_type
+            self._image_encodings[resource_id] = encoding
+        elif content_type != 'text/html':
+            # 其他类型的部分不会被使用，跳过正文解码
+            content = ''
+        else:
+            payload = self._decode_body(raw[body_start:], encoding)
+            charset = (self._charset_override or headers.get_content_charset()
+                       or self._default_charset or 'utf-8')
+            content = FileUtils.decode_bytes(payload, charset)
+
+        self.dataset.append((content_type, resource_id, content))
+
+    def _split_parts(self, buffer, boundary: bytes, start: int) -> None:
+        """按boundary定位各个部分，由C实现的find完成分隔符查找"""
+        delimiter = b'--' + boundary
+        pos = buffer.find(delimiter, start)
+        while pos >= 0:
+            part_start = pos + len(delimiter)
+            if buffer[part_start:part_start + 2] == b'--':
+                break
+
+            next_pos = buffer.find(delimiter, part_start)
+            part_end = next_pos if next_pos >= 0 else len(buffer)
+
+            # 跳过分隔符所在行，并去掉属于下一个分隔符的换行
+            line_end = buffer.find(b'\n', part_start, part_end)
+            if line_end >= 0:
+                part = buffer[line_end + 1:part_end]
+                if part.endswith(b'\r\n'):
+                    part = part[:-2]
+                elif part.endswith(b'\n'):
+                    part = part[:-1]
                 try:
-                    if '"' in line:
-                        return line.split('="')[1].rstrip('"')
-                    elif "'" in line:
-                        return line.split("='")[1].rstrip("'")
-                    else:
-                        return line.split('=')[1].strip()
-                except (IndexError, AttributeError):
-                    continue
-        return None
+                    self._process_part(part)
+                except Exception as e:
+                    print(f"Warning: Failed to process part: {str(e)}")
+
+            pos = next_pos
+
+    def _parse_buffer(self, buffer) -> None:
+        """解析完整的MHTML缓冲区"""
+        headers, body_start = self._parse_headers(buffer, len(buffer), self._charset_override or 'utf-8')
+        boundary = headers.get_boundary()
+        if not boundary:
+            raise ValueError("Could not find boundary in MHTML content")
+        # QQ导出的文件通常只在最外层的multipart头部声明charset
+        self._default_charset = headers.get_content_charset()
+        self._split_parts(buffer, boundary.encode('utf-8'), body_start)
 
     def parse(self) -> None:
         """解析MHTML内容"""
@@ -221,68 +255,30 @@ class MHTMLParser:
             if not self.mhtml_content:
                 raise ValueError("No MHTML content set")
 
-            lines = self.mhtml_content.splitlines()
-            self.boundary = self._find_boundary(lines)
-            
-            if not self.boundary:
-                raise ValueError("Could not find boundary in MHTML content")
-
-            current_part = []
-            in_content = False
-
-            for line in lines:
-                if self.boundary in line:
-                    if current_part and in_content:
-                        try:
-                            part_data = self._process_part(current_part)
-                            if part_data[0] or part_data[1]:
-                                self.dataset.append(part_data)
-                        except Exception as e:
-                            print(f"Warning: Failed to process part: {str(e)}")
-                    current_part = []
-                    in_content = True
-                else:
-                    if in_content:
-                        current_part.append(line)
-
-            if current_part and in_content:
-                try:
-                    part_data = self._process_part(current_part)
-                    if part_data[0] or part_data[1]:
-                        self.dataset.append(part_data)
-                except Exception as e:
-                    print(f"Warning: Failed to process last part: {str(e)}")
+            content = self.mhtml_content
+            if isinstance(content, str):
+                # 文本已经被解码过，重新编码为UTF-8后HTML部分也应按UTF-8解码
+                content = content.encode('utf-8', errors='surrogateescape')
+                self._charset_override = 'utf-8'
+            else:
+                self._charset_override = None
+                if isinstance(content, memoryview):
+                    content = content.tobytes()
+            self._parse_buffer(content)
 
-    def set_mhtml_content(self, content: str) -> None:
+    def parse_file(self, file_path: str) -> None:
+        """通过内存映射读取并解析MHTML文件"""
+        with self.performance.measure("解析MHTML"):
+            self._charset_override = None
+            with FileUtils.read_file_mmap(file_path) as mapped:
+                self._parse_buffer(mapped)
+
+    def set_mhtml_content(self, content: Union[str, bytes]) -> None:
         """设置要解析的MHTML内容"""
         if not content:
             raise ValueError("MHTML content cannot be empty")
         self.mhtml_content = content
 
-    def _decode_base64(self, data: str) -> str:
-        """解码Base64编码的内容"""
-        try:
-            data = ''.join(data.split())
-            return base64.b64decode(data.encode()).decode('utf-8', errors='ignore')
-        except Exception as e:
-            return data
-
-    def _decode_quoted_printable(self, data: str) -> str:
-        """解码Quoted-Printable编码的内容"""
-        import quopri
-        try:
-            return quopri.decodestring(data.encode()).decode('utf-8', errors='ignore')
-        except Exception as e:
-            return data
-
-    def _get_header_value(self, header_line: str) -> str:
-        """从头部行中提取值"""
-        try:
-            value = header_line.split(':', 1)[1].strip()
-            return value.rstrip(';').strip()
-        except (IndexError, AttributeError):
-            return ""
-
     def _get_image_extension(self, content_type: str) -> str:
         """根据Content-Type获取图片扩展名"""
         type_map = {
@@ -1,19 +1,24 @@
 import os
-from typing import List, Dict, Optional
+import re
+from typing import Callable, List, Dict, Optional, Pattern, Tuple
 from .parser import MHTMLParser
 from .utils import FileUtils, PerformanceMonitor
 
 class MHTMLSplitter:
     """MHTML文件分割器，支持将大型MHTML文件分割成多个较小的HTML文件"""
 
-    def __init__(self, max_size_mb: int = 40):
+    _HEADER_RE = re.compile(rb'(<html.*?<body.*?>)', re.DOTALL | re.IGNORECASE)
+
+    def __init__(self, max_size_mb: int = 40, image_workers: Optional[int] = None):
         """
         初始化分割器
         
         Args:
             max_size_mb: 每个分割文件的最大大小（MB）
+            image_workers: 提取图片时使用的线程数（默认根据CPU数量决定）
         """
         self.max_size_mb = max_size_mb
+        self.image_workers = image_workers
         self.performance = PerformanceMonitor()
         self.file_utils = FileUtils()
         self.missing_images: Dict[str, List[str]] = {}
@@ -34,10 +39,9 @@ class MHTMLSplitter:
             images_dir = os.path.join(output_dir, "images")
             os.makedirs(images_dir, exist_ok=True)
 
-            # 读取原始文件
-            mhtml_content = self.file_utils.read_file(input_path)
-            parser = MHTMLParser(mhtml_content)
-            parser.parse()
+            # 解析原始文件
+            parser = MHTMLParser(image_workers=self.image_workers)
+            parser.parse_file(input_path)
 
             # 提取基本信息
             base_name = os.path.splitext(os.path.basename(input_path))[0]
@@ -47,47 +51,62 @@ class MHTMLSplitter:
             image_paths = parser.extract_images(images_dir)
             self._update_missing_images(parser.get_missing_images(), base_name)
 
+            # 所有分片共用同一个图片路径替换正则
+            rewrite_paths = self._build_path_rewriter(image_paths)
+
             # 检查文件大小
-            if len(mhtml_content) / (1024 * 1024) <= self.max_size_mb:
+            html_bytes = html_content.encode('utf-8')
+            if self.file_utils.get_file_size(input_path) / (1024 * 1024) <= self.max_size_mb:
                 # 如果文件较小，直接保存
                 output_path = os.path.join(output_dir, f"{base_name}.html")
-                self._save_html_file(output_path, html_content, image_paths)
+                self._save_html_file(output_path, html_bytes, rewrite_paths)
                 return [output_path]
 
             # 分割大文件
-            return self._split_large_file(html_content, base_name, output_dir, image_paths)
+            return self._split_large_file(html_bytes, base_name, output_dir, image_paths, rewrite_paths)
 
-    def _split_large_file(self, html_content: str, base_name: str, output_dir: str, 
-                         image_paths: Dict[str, str]) -> List[str]:
+    def _split_large_file(self, html_bytes: bytes, base_name: str, output_dir: str, 
+                         image_paths: Dict[str, str],
+                         rewrite_paths: Callable[[bytes], bytes]) -> List[str]:
         """处理大文件分割"""
         output_files = []
         current_size = 0
-        current_content = []
+        current_content = bytearray()
         file_counter = 1
+        max_size = self.max_size_mb * 1024 * 1024
 
         # 提取头部模板
-        header_template = self._extract_header_template(html_content)
+        header_template = self._extract_header_template(html_bytes)
+
+        # 预先建立图片索引，避免逐行对每张图片做文件系统调用
+        image_pattern, image_sizes = self._build_image_index(image_paths)
         
-        # 分析每行内容
-        for line in html_content.split('\n'):
-            line_size = len(line.encode('utf-8'))
-            image_size = self._calculate_line_images_size(line, image_paths)
+        # 按字节偏移逐行切片，不再生成整篇文档的行列表
+        pos = 0
+        total_size = len(html_bytes)
+        while pos < total_size:
+            next_pos = html_bytes.find(b'\n', pos) + 1 or total_size
+            line = html_bytes[pos:next_pos]
+            pos = next_pos
+
+            line_size = len(line)
+            image_size = self._calculate_line_images_size(line, image_pattern, image_sizes)
             
             # 检查是否需要创建新文件
-            if current_size + line_size + image_size > self.max_size_mb * 1024 * 1024:
+            if current_content and current_size + line_size + image_size > max_size:
                 # 保存当前文件
                 output_path = os.path.join(output_dir, f"{base_name}_{file_counter}.html")
                 self._save_html_file(output_path, 
                                    self._build_html_content(header_template, current_content),
-                                   image_paths)
+                                   rewrite_paths)
                 output_files.append(output_path)
                 
                 # 重置计数器
-                current_content = []
+                current_content.clear()
                 current_size = 0
                 file_counter += 1
             
-            current_content.append(line)
+            current_content += line
             current_size += line_size + image_size
 
         # 保存最后一个文件
@@ -95,41 +114,65 @@ class MHTMLSplitter:
             output_path = os.path.join(output_dir, f"{base_name}_{file_counter}.html")
             self._save_html_file(output_path,
                                self._build_html_content(header_template, current_content),
-                               image_paths)
+                               rewrite_paths)
             output_files.append(output_path)
 
         return output_files
 
-    def _extract_header_template(self, html_content: str) -> str:
+    def _extract_header_template(self, html_bytes: bytes) -> bytes:
         """提取HTML头部模板"""
-        import re
-        match = re.search(r'(<html.*?<body.*?>)', html_content, re.DOTALL | re.IGNORECASE)
+        match = self._HEADER_RE.search(html_bytes)
         if match:
             return match.group(1)
-        return "<html><body>"
+        return b"<html><body>"
 
-    def _build_html_content(self, header: str, content: List[str]) -> str:
+    def _build_html_content(self, header: bytes, content: bytearray) -> bytes:
         """构建完整的HTML内容"""
-        return f"{header}\n{''.join(content)}\n</body></html>"
+        return b"".join((header, b"\n", content, b"\n</body></html>"))
 
-    def _calculate_line_images_size(self, line: str, image_paths: Dict[str, str]) -> int:
-        """计算行中包含的图片大小"""
-        total_size = 0
+    def _build_image_index(self, image_paths: Dict[str, str]) -> Tuple[Optional[Pattern], Dict[bytes, int]]:
+        """统计图片文件大小，并为所有图片名构建一个匹配正则"""
+        image_sizes = {}
         for img_name, img_path in image_paths.items():
-            if img_name in line and os.path.exists(img_path):
-                total_size += os.path.getsize(img_path)
-        return total_size
+            if os.path.exists(img_path):
+                image_sizes[img_name.encode('utf-8')] = os.path.getsize(img_path)
 
-    def _save_html_file(self, output_path: str, content: str, image_paths: Dict[str, str]) -> None:
-        """保存HTML文件，更新图片路径"""
-        # 更新图片路径
-        for img_name, img_path in image_paths.items():
-            relative_path = os.path.join("images", os.path.basename(img_path))
-            content = content.replace(f'cid:{img_name}', relative_path)
-            content = content.replace(f'"{img_name}"', f'"{relative_path}"')
+        if not image_sizes:
+            return None, image_sizes
+
+        names = sorted(image_sizes, key=len, reverse=True)
+        return re.compile(b'|'.join(re.escape(name) for name in names)), image_sizes
 
-        # 保存文件
-        self.file_utils.write_file(output_path, content)
+    def _calculate_line_images_size(self, line: bytes, image_pattern: Optional[Pattern],
+                                    image_sizes: Dict[bytes, int]) -> int:
+        """计算行中包含的图片大小"""
+        if image_pattern is None:
+            return 0
+        return sum(image_sizes[name] for name in set(image_pattern.findall(line)))
+
+    def _build_path_rewriter(self, image_paths: Dict[str, str]) -> Callable[[bytes], bytes]:
+        """构建图片路径替换函数，一次扫描同时处理 cid:NAME 与 "NAME" 两种引用"""
+        relative_paths = {
+            img_name.encode('utf-8'): os.path.join("images", os.path.basename(img_path)).encode('utf-8')
+            for img_name, img_path in image_paths.items()
+        }
+        if not relative_paths:
+            return lambda content: content
+
+        names = b'|'.join(re.escape(name) for name in sorted(relative_paths, key=len, reverse=True))
+        pattern = re.compile(b'cid:(' + names + b')|"(' + names + b')"')
+
+        def replace(match) -> bytes:
+            if match.group(1) is not None:
+                return relative_paths[match.group(1)]
+            return b'"' + relative_paths[match.group(2)] + b'"'
+
+        return lambda content: pattern.sub(replace, content)
+
+    def _save_html_file(self, output_path: str, content: bytes,
+                        rewrite_paths: Callable[[bytes], bytes]) -> None:
+        """保存HTML文件，更新图片路径"""
+        self.file_utils.write_file(output_path, rewrite_paths(content))
 
     def _update_missing_images(self, missing_images: Dict[str, str], file_name: str) -> None:
         """更新丢失的图片信息"""
@@ -1,48 +1,62 @@
+import mmap
 import os
 import time
 import psutil
-from typing import Any, Optional
+from typing import Any, Optional, Union
 from contextlib import contextmanager
 
+try:
+    from charset_normalizer import from_bytes
+except ImportError:
+    from_bytes = None
+
+# 文件名中不允许出现的字符统一替换为下划线
+_UNSAFE_FILENAME_TABLE = str.maketrans({c: '_' for c in '<>:"/\\|?*'})
+
 class PerformanceMonitor:
     """性能监控工具，用于跟踪执行时间和内存使用情况"""
 
     def __init__(self):
-        self.start_time = time.time()
-        self.start_memory = psutil.Process().memory_info().rss
+        self._process = psutil.Process(os.getpid())
+        self.start_time = time.perf_counter_ns()
+        self.start_memory = self._get_rss()
         self.measurements = {}
 
+    def _get_rss(self) -> int:
+        """获取当前进程的常驻内存大小"""
+        return self._process.memory_info().rss
+
     @contextmanager
-    def measure(self, name: str):
+    def measure(self, name: str, sample_memory: bool = True):
         """
         测量代码块的执行时间和内存使用
         
         Args:
             name: 测量名称
+            sample_memory: 是否采样内存变化（热点路径中可关闭以省去系统调用）
         """
-        start_time = time.time()
-        start_memory = psutil.Process().memory_info().rss
+        start_time = time.perf_counter_ns()
+        start_memory = self._get_rss() if sample_memory else 0
         try:
             yield
         finally:
-            end_time = time.time()
-            end_memory = psutil.Process().memory_info().rss
+            end_time = time.perf_counter_ns()
             self.measurements[name] = {
-                'time': end_time - start_time,
-                'memory_delta': end_memory - start_memory
+                'time': (end_time - start_time) / 1e9,
+                'memory_delta': self._get_rss() - start_memory if sample_memory else None
             }
 
     def get_total_time(self) -> float:
         """获取总执行时间"""
-        return time.time() - self.start_time
+        return (time.perf_counter_ns() - self.start_time) / 1e9
 
     def get_memory_usage(self) -> int:
         """获取当前内存使用量"""
-        return psutil.Process().memory_info().rss - self.start_memory
+        return self._get_rss() - self.start_memory
 
     def get_peak_memory(self) -> int:
         """获取峰值内存使用量"""
-        return psutil.Process().memory_info().rss
+        return self._get_rss()
 
     def _format_size(self, size: int) -> str:
         """格式化大小显示"""
@@ -65,7 +79,8 @@ class PerformanceMonitor:
         for name, data in self.measurements.items():
             report.append(f"- {name}:")
             report.append(f"  执行时间: {data['time']:.3f} 秒")
-            report.append(f"  内存变化: {self._format_size(data['memory_delta'])}")
+            if data['memory_delta'] is not None:
+                report.append(f"  内存变化: {self._format_size(data['memory_delta'])}")
 
         return "\n".join(report)
 
@@ -73,6 +88,9 @@ class PerformanceMonitor:
 class FileUtils:
     """文件操作工具类"""
 
+    WRITE_BUFFER_SIZE = 1024 * 1024
+    _created_dirs = set()
+
     @staticmethod
     def read_file(file_path: str, encoding: str = 'utf-8') -> str:
         """
@@ -85,36 +103,87 @@ class FileUtils:
         Returns:
             str: 文件内容
         """
+        # 只读取一次文件，之后的编码尝试都在内存中完成
+        with open(file_path, 'rb') as f:
+            return FileUtils.decode_bytes(f.read(), encoding)
+
+    @staticmethod
+    def decode_bytes(data: bytes, encoding: str = 'utf-8') -> str:
+        """
+        解码二进制内容，指定编码失败时自动检测或尝试其他常见编码
+        
+        Args:
+            data: 二进制内容
+            encoding: 优先使用的编码
+        
+        Returns:
+            str: 解码后的文本
+        """
         try:
-            with open(file_path, 'r', encoding=encoding) as f:
-                return f.read()
-        except UnicodeDecodeError:
-            # 如果UTF-8解码失败，尝试其他编码
-            encodings = ['gbk', 'gb2312', 'big5', 'latin1']
-            for enc in encodings:
-                try:
-                    with open(file_path, 'r', encoding=enc) as f:
-                        return f.read()
-                except UnicodeDecodeError:
-                    continue
-            # 如果所有编码都失败，使用二进制模式读取
-            with open(file_path, 'rb') as f:
-                return f.read().decode('utf-8', errors='ignore')
+            return data.decode(encoding)
+        except (UnicodeDecodeError, LookupError):
+            pass
+
+        # 如果指定编码解码失败，优先通过charset-normalizer检测编码
+        if from_bytes is not None:
+            best = from_bytes(data).best()
+            if best is not None:
+                return str(best)
+
+        # 未安装charset-normalizer时，依次尝试其他常见编码
+        for enc in ['gbk', 'gb2312', 'big5', 'latin1']:
+            try:
+                return data.decode(enc)
+            except UnicodeDecodeError:
+                continue
+        return data.decode('utf-8', errors='ignore')
 
     @staticmethod
-    def write_file(file_path: str, content: str, encoding: str = 'utf-8') -> None:
+    def read_file_mmap(file_path: str) -> mmap.mmap:
+        """
+        以只读方式内存映射文件，避免将整个文件读入并解码为字符串
+        
+        Args:
+            file_path: 文件路径
+        
+        Returns:
+            mmap.mmap: 文件的只读映射，使用完毕后需要关闭
+        """
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError(f"File is empty: {file_path}")
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def write_file(file_path: str, content: Union[str, bytes], encoding: str = 'utf-8') -> None:
         """
         写入文件内容
         
         Args:
             file_path: 文件路径
-            content: 要写入的内容
+            content: 要写入的内容（bytes将按原样写入）
             encoding: 文件编码
         """
-        # 确保目录存在
-        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
-        
-        with open(file_path, 'w', encoding=encoding) as f:
+        # 确保目录存在，同一目录只创建一次
+        directory = os.path.dirname(os.path.abspath(file_path))
+        if directory not in FileUtils._created_dirs:
+            os.makedirs(directory, exist_ok=True)
+            FileUtils._created_dirs.add(directory)
+
+        if isinstance(content, str):
+            content = content.encode(encoding)
+
+        # 以二进制模式配合大缓冲区写入，减少系统调用并跳过换行符转换
+        try:
+            f = open(file_path, 'wb', buffering=FileUtils.WRITE_BUFFER_SIZE)
+        except FileNotFoundError:
+            # 缓存的目录可能已被删除，重新创建后再试一次
+            FileUtils._created_dirs.discard(directory)
+            os.makedirs(directory, exist_ok=True)
+            FileUtils._created_dirs.add(directory)
+            f = open(file_path, 'wb', buffering=FileUtils.WRITE_BUFFER_SIZE)
+
+        with f:
             f.write(content)
 
     @staticmethod
@@ -152,9 +221,8 @@ class FileUtils:
         Returns:
             str: 安全的文件名
         """
-        import re
         # 移除非法字符
-        safe_name = re.sub(r'[<>:"/\\|?*]', '_', filename)
+        safe_name = filename.translate(_UNSAFE_FILENAME_TABLE)
         # 确保文件名不为空
         if not safe_name:
             safe_name = 'unnamed_file'
@@ -14,20 +14,25 @@ setup(
     packages=find_packages(),
     classifiers=[
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9",
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    python_requires=">=3.6",
+    python_requires=">=3.7",
     install_requires=[
         "psutil>=5.7.0",
     ],
+    extras_require={
+        "speedups": [
+            "charset-normalizer>=2.0",
+            "pybase64>=1.0",
+        ],
+    },
     entry_points={
         "console_scripts": [
-            "mhtml-converter=mhtml_converter.__main__:main",
+            "mhtml-converter=mhtml_converter.cli:main",
         ],
     },
 )
@@ -0,0 +1,79 @@
+import base64
+import os
+import tempfile
+import unittest
+
+from mhtml_converter import MHTMLParser
+
+BOUNDARY = "----=_NextPart_TEST"
+GIF = b"GIF89a" + bytes(range(64))
+
+
+def build_mhtml(html: str, charset: str = "utf-8") -> bytes:
+    """构建包含两张图片的MHTML，图片分别通过非ASCII的Content-ID和Content-Location引用"""
+    first = base64.encodebytes(GIF)
+    second = base64.encodebytes(GIF[::-1])
+    return b"".join((
+        b"MIME-Version: 1.0\r\n",
+        f'Content-Type: multipart/related; charset="{charset}"; '
+        f'type="text/html"; boundary="{BOUNDARY}"\r\n\r\n'.encode("ascii"),
+        f"--{BOUNDARY}\r\nContent-Type: text/html\r\n"
+        "Content-Transfer-Encoding: 8bit\r\n\r\n".encode("ascii"),
+        html.encode(charset), b"\r\n",
+        f"--{BOUNDARY}\r\nContent-Type: image/gif\r\n"
+        "Content-Transfer-Encoding: base64\r\n".encode("ascii"),
+        "Content-ID: <图1>\r\n\r\n".encode(charset), first, b"\r\n",
+        f"--{BOUNDARY}\r\nContent-Type: image/gif\r\n"
+        "Content-Transfer-Encoding: base64\r\n".encode("ascii"),
+        "Content-Location: 图2.dat\r\n\r\n".encode(charset), second, b"\r\n",
+        f"--{BOUNDARY}--\r\n".encode("ascii"),
+    ))
+
+
+HTML = '<html><body>你好世界<img src="cid:图1"><img src="图2.dat"></body></html>'
+
+
+class MHTMLParserTest(unittest.TestCase):
+
+    def test_non_ascii_resource_headers(self):
+        parser = MHTMLParser(build_mhtml(HTML))
+        parser.parse()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            image_paths = parser.extract_images(tmp)
+            self.assertEqual(set(image_paths), {"图1", "图2.dat"})
+            for filename in image_paths.values():
+                self.assertTrue(os.path.exists(os.path.join(tmp, filename)))
+
+        html = parser.get_html(embedded_images=False)
+        self.assertEqual(html.count('src="images/'), 2)
+        self.assertEqual(parser.get_missing_images(), {})
+
+    def test_non_ascii_resource_headers_embedded(self):
+        parser = MHTMLParser(build_mhtml(HTML))
+        parser.parse()
+
+        html = parser.get_html(embedded_images=True)
+        self.assertEqual(html.count('src="data:image/gif;base64,'), 2)
+
+    def test_gbk_document(self):
+        parser = MHTMLParser(build_mhtml(HTML, charset="gbk"))
+        parser.parse()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            parser.extract_images(tmp)
+
+        html = parser.get_html(embedded_images=False)
+        self.assertIn("你好世界", html)
+        self.assertEqual(html.count('src="images/'), 2)
+
+    def test_str_input_is_decoded_as_utf8(self):
+        content = build_mhtml(HTML, charset="gbk").decode("gbk")
+        parser = MHTMLParser(content)
+        parser.parse()
+
+        self.assertIn("你好世界", parser.get_html(embedded_images=False))
+
+
+if __name__ == "__main__":
+    unittest.main()